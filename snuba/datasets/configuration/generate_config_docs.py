@@ -1,4 +1,5 @@
 from tempfile import TemporaryDirectory
+from typing import Any, Mapping
 
 import jsonschema2md
 
@@ -8,6 +9,25 @@ from snuba.datasets.configuration.json_schema import V1_ALL_SCHEMAS
 CONFIGURATION_DOCS_PATH = f"{settings.ROOT_REPO_PATH}/docs/source/configuration"
 
 
+def inline_refs(schema: Any, definitions: Mapping[str, Any]) -> Any:
+    """
+    jsonschema2md does not render `$defs`, so every `$ref` is replaced with
+    the definition it points to and the `$defs` themselves are dropped.
+    """
+    if isinstance(schema, list):
+        return [inline_refs(item, definitions) for item in schema]
+    if not isinstance(schema, dict):
+        return schema
+    if "$ref" in schema:
+        name = schema["$ref"].rsplit("/", 1)[-1]
+        return inline_refs(definitions[name], definitions)
+    return {
+        key: inline_refs(value, definitions)
+        for key, value in schema.items()
+        if key != "$defs"
+    }
+
+
 if __name__ == "__main__":
     for component, schema in V1_ALL_SCHEMAS.items():
         with TemporaryDirectory() as temp_dir:
@@ -15,7 +35,7 @@ if __name__ == "__main__":
                 examples_as_yaml=False,
                 show_examples="all",
             )
-            md_lines = parser.parse_schema(schema)
+            md_lines = parser.parse_schema(inline_refs(schema, schema.get("$defs", {})))
             reformatted_md_lines = []
             for line in md_lines:
                 # jsonschema2md adds some extra lines of its own. This removes them.
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
+import json
 from copy import deepcopy
-from typing import Any
+from functools import lru_cache
+from typing import Any, Callable, Mapping, cast
 
 import fastjsonschema
 import sentry_sdk
@@ -98,7 +100,10 @@ STREAM_LOADER_SCHEMA = {
 def make_column_schema(
     column_type: dict[str, Any], args: dict[str, Any]
 ) -> dict[str, Any]:
-    args["properties"]["schema_modifiers"] = TYPE_STRING_ARRAY
+    args = {
+        **args,
+        "properties": {**args["properties"], "schema_modifiers": TYPE_STRING_ARRAY},
+    }
     return {
         "type": "object",
         "properties": {
@@ -110,6 +115,14 @@ def make_column_schema(
     }
 
 
+def definition_ref(name: str) -> dict[str, str]:
+    """
+    Reference to one of the COLUMN_DEFINITIONS or ENTITY_DEFINITIONS. Any top
+    level schema using it must include the definition under its `$defs` key.
+    """
+    return {"$ref": f"#/$defs/{name}"}
+
+
 def del_name_field(column_schema: dict[str, Any]) -> dict[str, Any]:
     """
     Useful for simply removing the `name` field from a Column Schema.
@@ -167,7 +180,7 @@ AGGREGATE_FUNCTION_SCHEMA = make_column_schema(
             "func": TYPE_STRING,
             "arg_types": {
                 "type": "array",
-                "items": {"anyOf": _SIMPLE_COLUMN_TYPES},
+                "items": definition_ref("simple_column_type"),
             },
         },
         "additionalProperties": False,
@@ -212,7 +225,7 @@ _SUB_ARRAY_SCHEMA = make_column_schema(
     column_type={"const": "Array"},
     args={
         "type": "object",
-        "properties": {"inner_type": {"anyOf": _SIMPLE_ARRAY_INNER_TYPES}},
+        "properties": {"inner_type": definition_ref("array_inner_type")},
         "additionalProperties": False,
     },
 )
@@ -222,7 +235,9 @@ ARRAY_SCHEMA = make_column_schema(
     args={
         "type": "object",
         "properties": {
-            "inner_type": {"anyOf": [*_SIMPLE_ARRAY_INNER_TYPES, _SUB_ARRAY_SCHEMA]}
+            "inner_type": {
+                "anyOf": [definition_ref("array_inner_type"), _SUB_ARRAY_SCHEMA]
+            }
         },
         "additionalProperties": False,
     },
@@ -239,15 +254,48 @@ NESTED_SCHEMA = make_column_schema(
     args={
         "type": "object",
         "properties": {
-            "subcolumns": {"type": "array", "items": {"anyOf": COLUMN_SCHEMAS}}
+            "subcolumns": {"type": "array", "items": definition_ref("column")}
         },
         "additionalProperties": False,
     },
 )
 
+# The column schemas are repeated in several places (nested subcolumns, array
+# inner types, aggregate function arguments). Declaring them once and using
+# `$ref` lets the compiled validator share a single function per definition
+# instead of inlining the whole subtree at every occurrence.
+COLUMN_DEFINITIONS: dict[str, Any] = {
+    "simple_column_type": {"anyOf": _SIMPLE_COLUMN_TYPES},
+    "array_inner_type": {"anyOf": _SIMPLE_ARRAY_INNER_TYPES},
+    "column": {"anyOf": COLUMN_SCHEMAS},
+}
+
+# Every column but a nested one matches one of COLUMN_SCHEMAS, so its `type`
+# alone tells which of the two to validate it against. Checking the `type`
+# up front spares nested columns from failing every branch of "column"
+# first, which is costly since fastjsonschema raises an exception for each
+# failed branch. The single branch `anyOf` only keeps the error messages as
+# they were: fastjsonschema garbles the index in the path of errors raised
+# from a `$ref` inside `items`.
+_COLUMN_TYPES = [
+    type_value
+    for column_schema in COLUMN_SCHEMAS
+    for type_value in column_schema["properties"]["type"].get(
+        "enum", [column_schema["properties"]["type"].get("const")]
+    )
+]
+
 SCHEMA_COLUMNS = {
     "type": "array",
-    "items": {"anyOf": [*COLUMN_SCHEMAS, NESTED_SCHEMA]},
+    "items": {
+        "anyOf": [
+            {
+                "if": {"properties": {"type": {"enum": _COLUMN_TYPES}}},
+                "then": definition_ref("column"),
+                "else": NESTED_SCHEMA,
+            }
+        ]
+    },
     "description": "Objects (or nested objects) representing columns containg a name, type and args",
 }
 
@@ -419,15 +467,22 @@ ENTITY_TRANSLATION_MAPPERS = {
     "type": "object",
     "description": "Represents the set of rules used to translates different expression types",
     "properties": {
-        "columns": ENTITY_TRANSLATION_MAPPER_SUB_LIST,
-        "functions": ENTITY_TRANSLATION_MAPPER_SUB_LIST,
-        "curried_functions": ENTITY_TRANSLATION_MAPPER_SUB_LIST,
-        "subscriptables": ENTITY_TRANSLATION_MAPPER_SUB_LIST,
-        "columns": ENTITY_TRANSLATION_MAPPER_SUB_LIST,
+        "columns": definition_ref("translation_mapper_list"),
+        "functions": definition_ref("translation_mapper_list"),
+        "curried_functions": definition_ref("translation_mapper_list"),
+        "subscriptables": definition_ref("translation_mapper_list"),
     },
     "additionalProperties": False,
 }
 
+# Every expression type of ENTITY_TRANSLATION_MAPPERS uses the same mapper
+# list, so the compiled validator gets one function for it that all of them
+# call.
+ENTITY_DEFINITIONS: dict[str, Any] = {
+    **COLUMN_DEFINITIONS,
+    "translation_mapper_list": ENTITY_TRANSLATION_MAPPER_SUB_LIST,
+}
+
 ENTITY_SUBSCRIPTION_PROCESSORS = {
     "type": "array",
     "items": {
@@ -540,6 +595,7 @@ ENTITY_JOIN_RELATIONSHIPS = {
 V1_READABLE_STORAGE_SCHEMA = {
     "title": "Readable Storage Schema",
     "type": "object",
+    "$defs": COLUMN_DEFINITIONS,
     "properties": {
         "version": {"const": "v1", "description": "Version of schema"},
         "kind": {"const": "readable_storage", "description": "Component kind"},
@@ -566,6 +622,7 @@ V1_READABLE_STORAGE_SCHEMA = {
 V1_WRITABLE_STORAGE_SCHEMA = {
     "title": "Writable Storage Schema",
     "type": "object",
+    "$defs": COLUMN_DEFINITIONS,
     "properties": {
         "version": {"const": "v1", "description": "Version of schema"},
         "kind": {"const": "writable_storage", "description": "Component kind"},
@@ -601,6 +658,7 @@ V1_WRITABLE_STORAGE_SCHEMA = {
 V1_CDC_STORAGE_SCHEMA = {
     "title": "Writable Storage Schema",
     "type": "object",
+    "$defs": COLUMN_DEFINITIONS,
     "properties": {
         "version": {"const": "v1", "description": "Version of schema"},
         "kind": {"const": "cdc_storage", "description": "Component kind"},
@@ -639,6 +697,7 @@ V1_CDC_STORAGE_SCHEMA = {
 V1_ENTITY_SCHEMA = {
     "title": "Entity Schema",
     "type": "object",
+    "$defs": ENTITY_DEFINITIONS,
     "properties": {
         "version": {"const": "v1", "description": "Version of schema"},
         "kind": {"const": "entity", "description": "Component kind"},
@@ -754,19 +813,69 @@ V1_MIGRATION_GROUP_SCHEMA = {
     "additionalProperties": False,
 }
 
+
+# Keywords whose values are literal data rather than schemas.
+_LITERAL_KEYWORDS = {"const", "enum", "default", "examples"}
+# Keywords whose values map arbitrary names to schemas.
+_SCHEMA_MAP_KEYWORDS = {"properties", "patternProperties", "$defs", "definitions"}
+
+
+def _normalize(schema: Any) -> Any:
+    """
+    Rewrites every single value `enum` into a `const`, which fastjsonschema
+    compiles to a plain equality check instead of a list membership test.
+    """
+    if isinstance(schema, list):
+        return [_normalize(item) for item in schema]
+    if not isinstance(schema, dict):
+        return schema
+
+    normalized: dict[str, Any] = {}
+    for key, value in schema.items():
+        if key in _LITERAL_KEYWORDS:
+            normalized[key] = value
+        elif key in _SCHEMA_MAP_KEYWORDS and isinstance(value, dict):
+            normalized[key] = {name: _normalize(sub) for name, sub in value.items()}
+        else:
+            normalized[key] = _normalize(value)
+
+    enum = normalized.get("enum")
+    if isinstance(enum, list) and len(enum) == 1 and "const" not in normalized:
+        del normalized["enum"]
+        normalized["const"] = enum[0]
+    return normalized
+
+
+@lru_cache(maxsize=256)
+def _compile_validator(schema_json: str) -> Callable[[Any], Any]:
+    return cast(
+        Callable[[Any], Any],
+        fastjsonschema.compile(_normalize(json.loads(schema_json))),
+    )
+
+
+def get_validator(schema: dict[str, Any]) -> Callable[[Any], Any]:
+    """
+    Returns the compiled validator for a schema. Validators are cached by the
+    canonical JSON form of the schema, so schemas that are structurally equal
+    share a single validator even if they are different dict instances.
+    """
+    return _compile_validator(json.dumps(schema, sort_keys=True))
+
+
 with sentry_sdk.start_span(op="compile", description="Storage Validators"):
     STORAGE_VALIDATORS = {
-        "readable_storage": fastjsonschema.compile(V1_READABLE_STORAGE_SCHEMA),
-        "writable_storage": fastjsonschema.compile(V1_WRITABLE_STORAGE_SCHEMA),
-        "cdc_storage": fastjsonschema.compile(V1_CDC_STORAGE_SCHEMA),
+        "readable_storage": get_validator(V1_READABLE_STORAGE_SCHEMA),
+        "writable_storage": get_validator(V1_WRITABLE_STORAGE_SCHEMA),
+        "cdc_storage": get_validator(V1_CDC_STORAGE_SCHEMA),
     }
 
 with sentry_sdk.start_span(op="compile", description="Entity Validators"):
-    ENTITY_VALIDATORS = {"entity": fastjsonschema.compile(V1_ENTITY_SCHEMA)}
+    ENTITY_VALIDATORS = {"entity": get_validator(V1_ENTITY_SCHEMA)}
 
 
 with sentry_sdk.start_span(op="compile", description="Dataset Validators"):
-    DATASET_VALIDATORS = {"dataset": fastjsonschema.compile(V1_DATASET_SCHEMA)}
+    DATASET_VALIDATORS = {"dataset": get_validator(V1_DATASET_SCHEMA)}
 
 
 ALL_VALIDATORS = {
@@ -777,7 +886,7 @@ ALL_VALIDATORS = {
 }
 
 
-V1_ALL_SCHEMAS = {
+V1_ALL_SCHEMAS: Mapping[str, Mapping[str, Any]] = {
     "dataset": V1_DATASET_SCHEMA,
     "entity": V1_ENTITY_SCHEMA,
     "readable_storage": V1_READABLE_STORAGE_SCHEMA,
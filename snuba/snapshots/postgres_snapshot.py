@@ -8,7 +8,9 @@ from contextlib import contextmanager
 from dataclasses import dataclass
 from typing import Generator, Iterable, NewType, Sequence
 
+import fastjsonschema
 import jsonschema
+from fastjsonschema.exceptions import JsonSchemaValueException
 
 from snuba import settings
 from snuba.snapshots import (
@@ -82,6 +84,8 @@ SNAPSHOT_METADATA_SCHEMA = {
     ],
 }
 
+validate_snapshot_metadata = fastjsonschema.compile(SNAPSHOT_METADATA_SCHEMA)
+
 
 @dataclass(frozen=True)
 class PostgresSnapshotDescriptor(SnapshotDescriptor):
@@ -117,10 +121,10 @@ class PostgresSnapshot(BulkLoadSource):
         meta_file_name = os.path.join(path, "metadata.json")
         with open(meta_file_name, "r") as meta_file:
             json_desc = json.load(meta_file)
-            jsonschema.validate(
-                json_desc,
-                SNAPSHOT_METADATA_SCHEMA,
-            )
+            try:
+                validate_snapshot_metadata(json_desc)
+            except JsonSchemaValueException as e:
+                raise jsonschema.ValidationError(e.message) from e
 
             if json_desc["product"] != product:
                 raise ValueError(
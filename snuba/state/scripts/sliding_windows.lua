@@ -0,0 +1,92 @@
+-- KEYS: Every granule key of every requested quota, without duplicates.
+--
+-- ARGV[1]: The number of timestamps, followed by, for every timestamp:
+--   * The number of requests, followed by, for every request:
+--     * The requested amount.
+--     * The number of quotas, followed by, for every quota:
+--       * The limit.
+--       * The window in seconds, used as the TTL of the incremented key.
+--       * The ID of the quota if it has a prefix override, 0 otherwise.
+--       * The number of granules, followed by the index into KEYS of every
+--         granule, newest first.
+--
+-- The timestamps are processed in order, each one seeing the quota spent by
+-- the ones before it. Returns, for every request of every timestamp, the
+-- granted amount followed by one flag per quota that is 1 if the quota was
+-- reached and 0 otherwise.
+
+local result = {}
+
+local pos = 2
+for _ = 1, tonumber(ARGV[1]) do
+    -- Granules are read before anything is spent for this timestamp so that
+    -- its requests only see each other through the global quotas, like the
+    -- check_within_quotas/use_quotas code path.
+    local used = {}
+    local function get_used(index)
+        if used[index] == nil then
+            used[index] = tonumber(redis.call('GET', KEYS[index]) or 0)
+        end
+        return used[index]
+    end
+
+    local global_used = {}
+    local increments = {}
+    local incremented = {}
+    local ttls = {}
+
+    local num_requests = tonumber(ARGV[pos])
+    pos = pos + 1
+
+    for _ = 1, num_requests do
+        local granted = tonumber(ARGV[pos])
+        local num_quotas = tonumber(ARGV[pos + 1])
+        pos = pos + 2
+
+        local quotas = {}
+        for q = 1, num_quotas do
+            local limit = tonumber(ARGV[pos])
+            local window = tonumber(ARGV[pos + 1])
+            local global_id = tonumber(ARGV[pos + 2])
+            local num_granules = tonumber(ARGV[pos + 3])
+
+            local used_quota = global_used[global_id] or 0
+            for g = 1, num_granules do
+                used_quota = used_quota + get_used(tonumber(ARGV[pos + 3 + g]))
+            end
+
+            local reached = 0
+            local remaining = math.max(0, limit - used_quota)
+            if remaining < granted then
+                granted = remaining
+                reached = 1
+            end
+
+            quotas[q] = {tonumber(ARGV[pos + 4]), window, global_id, reached}
+            pos = pos + 4 + num_granules
+        end
+
+        table.insert(result, granted)
+        for _, quota in ipairs(quotas) do
+            local index = quota[1]
+            if increments[index] == nil then
+                increments[index] = 0
+                table.insert(incremented, index)
+            end
+            increments[index] = increments[index] + granted
+            ttls[index] = quota[2]
+            if quota[3] ~= 0 then
+                global_used[quota[3]] = (global_used[quota[3]] or 0) + granted
+            end
+            table.insert(result, quota[4])
+        end
+    end
+
+    -- Only the most recent granule of every quota is incremented.
+    for _, index in ipairs(incremented) do
+        redis.call('INCRBY', KEYS[index], increments[index])
+        redis.call('EXPIRE', KEYS[index], ttls[index])
+    end
+end
+
+return result
@@ -9,9 +9,12 @@ Instead each window can be configured with a "granularity" setting such that
 the window gradually resets in steps of `granularity` seconds.
 
 Additionally this rate-limiter is not coupled to per-project/organization
-scopes, and can apply multiple sliding windows at once. On the flipside it is
-not strongly consistent and depending on usage it is very easy to over-spend
-quota, as checking quota and spending quota are two separate steps.
+scopes, and can apply multiple sliding windows at once.
+
+On a single Redis instance, checking quota and spending quota happen
+atomically in one Lua script. On a Redis Cluster they are two separate steps,
+so the rate limiter is not strongly consistent there and depending on usage it
+is very easy to over-spend quota.
 
 Example
 =======
@@ -79,9 +82,13 @@ When using the quotas, the keys change as follows:
 
 from collections import defaultdict
 from dataclasses import dataclass
+from functools import lru_cache
 from time import time
-from typing import Iterator, MutableMapping, Optional, Sequence, Tuple
+from typing import Iterator, List, MutableMapping, Optional, Sequence, Tuple
+
+from pkg_resources import resource_string
 
+from redis.cluster import RedisCluster
 from snuba.redis import RedisClientKey, get_redis_client
 
 
@@ -175,9 +182,32 @@ class GrantedQuota:
 Timestamp = int
 
 
+@lru_cache(maxsize=1024)
+def _build_redis_key_prefix(prefix: str, window: int, granularity: int) -> str:
+    """
+    Everything but the granule of a quota's redis keys. The same prefixes
+    are needed for every granule and on every call, so they are cached.
+    """
+    if "{" in prefix or "}" in prefix:
+        # The rate limiter does not allow you to control the Redis sharding
+        # key through the prefix, so that sharding of the keys stays under
+        # its control. The keys currently carry no hash tag, which is why
+        # the Lua script cannot run on a Redis Cluster. Hash-tagging the
+        # keys is what would let it run there too.
+        raise ValueError("Explicit sharding not allowed in RequestedQuota.prefix")
+
+    return f"sliding-window-rate-limit:{prefix}:{window}:{granularity}:"
+
+
 class RedisSlidingWindowRateLimiter:
     def __init__(self) -> None:
         self.client = get_redis_client(RedisClientKey.RATE_LIMITER)
+        self.__script_check_and_use = self.client.register_script(
+            resource_string("snuba", "state/scripts/sliding_windows.lua")
+        )
+        # The keys of a quota are not pinned to a hash slot, so a Redis Cluster
+        # cannot run the script.
+        self._use_script = not isinstance(self.client, RedisCluster)
 
     def validate(self) -> None:
         try:
@@ -189,17 +219,7 @@ class RedisSlidingWindowRateLimiter:
     def _build_redis_key_raw(
         self, prefix: str, window: int, granularity: int, granule: int
     ) -> str:
-        if "{" in prefix or "}" in prefix:
-            # The rate limiter currently does not allow you to control the
-            # Redis sharding key through the prefix`. This is currently an
-            # arbitrary limitation, but the reason for this is that one day we
-            # may want to rewrite the internals to run inside of a Lua script
-            # to allow for (partially) atomic check-and-use of rate limits (or
-            # do that for performance reasons), in which case the rate limiter
-            # would have to take control of sharding itself.
-            raise ValueError("Explicit sharding not allowed in RequestedQuota.prefix")
-
-        return f"sliding-window-rate-limit:{prefix}:{window}:{granularity}:{granule}"
+        return f"{_build_redis_key_prefix(prefix, window, granularity)}{granule}"
 
     def _build_redis_key(
         self, request: RequestedQuota, quota: Quota, granule: int
@@ -211,6 +231,32 @@ class RedisSlidingWindowRateLimiter:
             granule=granule,
         )
 
+    def _build_granule_keys(
+        self,
+        prefixes: Sequence[str],
+        quotas_per_request: Sequence[Sequence[Quota]],
+        timestamp: Timestamp,
+    ) -> List[List[List[str]]]:
+        """
+        The redis keys of every granule, newest first, of every quota of every
+        request. Indexed by request position, then quota position.
+        """
+        return [
+            [
+                [
+                    self._build_redis_key_raw(
+                        prefix=quota.prefix_override or prefix,
+                        window=quota.window_seconds,
+                        granularity=quota.granularity_seconds,
+                        granule=granule,
+                    )
+                    for granule in quota.iter_window(timestamp)
+                ]
+                for quota in quotas
+            ]
+            for prefix, quotas in zip(prefixes, quotas_per_request)
+        ]
+
     def check_within_quotas(
         self, requests: Sequence[RequestedQuota], timestamp: Optional[Timestamp] = None
     ) -> Tuple[Timestamp, Sequence[GrantedQuota]]:
@@ -219,30 +265,31 @@ class RedisSlidingWindowRateLimiter:
         else:
             timestamp = int(timestamp)
 
-        keys_to_fetch = set()
-        for request in requests:
-            # We could potentially run this check inside of __post__init__ of
-            # RequestedQuota, but the list is actually mutable after
-            # construction.
-            assert request.quotas
+        # Read every field of the requests once. All loops below work on these
+        # parallel lists by position.
+        prefixes = [request.prefix for request in requests]
+        requested = [request.requested for request in requests]
+        quotas_per_request = [request.quotas for request in requests]
 
-            for quota in request.quotas:
-                for granule in quota.iter_window(timestamp):
-                    keys_to_fetch.add(
-                        self._build_redis_key(
-                            request=request, quota=quota, granule=granule
-                        )
-                    )
+        # We could potentially run this check inside of __post__init__ of
+        # RequestedQuota, but the list is actually mutable after
+        # construction.
+        assert all(quotas_per_request)
 
-        # Stabilize the iteration order of `keys_to_fetch` by converting it
-        # into a list, because the next line will iterate over keys_to_fetch
-        # twice.
-        #
-        # While CPython 3.8 does not change the iteration order of a set as
-        # long as it is not being modified
-        # (https://stackoverflow.com/a/3812600/1544347), there are no formal
-        # guarantees about it.
-        ordered_keys_to_fetch = list(keys_to_fetch)
+        keys_per_request = self._build_granule_keys(
+            prefixes, quotas_per_request, timestamp
+        )
+
+        # Stabilize the iteration order of the keys to fetch by building a
+        # list, because the next line will iterate over it twice.
+        ordered_keys_to_fetch = list(
+            {
+                key: None
+                for keys_per_quota in keys_per_request
+                for keys in keys_per_quota
+                for key in keys
+            }
+        )
         p = self.client.pipeline()
         for k in ordered_keys_to_fetch:
             p.get(k)
@@ -260,10 +307,10 @@ class RedisSlidingWindowRateLimiter:
         # just because each request happens to fit into it
         quota_used_cache: MutableMapping[int, int] = defaultdict(int)
 
-        for request in requests:
+        for i, quotas in enumerate(quotas_per_request):
             # We start out with assuming the entire request can be granted in
             # its entirety.
-            granted_quota = request.requested
+            granted_quota = requested[i]
             reached_quotas = []
 
             # A request succeeds (partially) if it fits (partially) into all
@@ -273,19 +320,9 @@ class RedisSlidingWindowRateLimiter:
             # We need to explicitly handle the possibility that quotas have
             # been overused, in those cases we want to truncate resulting
             # negative "grants" to zero.
-            for quota in request.quotas:
+            for quota, keys in zip(quotas, keys_per_request[i]):
                 used_quota = (
-                    sum(
-                        int(
-                            redis_results.get(
-                                self._build_redis_key(
-                                    request=request, quota=quota, granule=granule
-                                )
-                            )
-                            or 0
-                        )
-                        for granule in quota.iter_window(timestamp)
-                    )
+                    sum(int(redis_results.get(key) or 0) for key in keys)
                     + quota_used_cache[id(quota)]
                 )
 
@@ -295,13 +332,13 @@ class RedisSlidingWindowRateLimiter:
                     granted_quota = remaining_quota
                     reached_quotas.append(quota)
 
-            for quota in request.quotas:
+            for quota in quotas:
                 if quota.prefix_override:
                     quota_used_cache[id(quota)] += granted_quota
 
             results.append(
                 GrantedQuota(
-                    prefix=request.prefix,
+                    prefix=prefixes[i],
                     granted=granted_quota,
                     reached_quotas=reached_quotas,
                 )
@@ -351,6 +388,100 @@ class RedisSlidingWindowRateLimiter:
         Check the quota requests in Redis and consume the quota in one go. See
         `check_within_quotas` for parameters.
         """
-        timestamp, grants = self.check_within_quotas(requests, timestamp)
-        self.use_quotas(requests, grants, timestamp)
-        return grants
+        if timestamp is None:
+            timestamp = int(time())
+
+        return self.check_and_use_quotas_batch([(timestamp, requests)])[0]
+
+    def check_and_use_quotas_batch(
+        self,
+        requests_per_timestamp: Sequence[Tuple[Timestamp, Sequence[RequestedQuota]]],
+    ) -> Sequence[Sequence[GrantedQuota]]:
+        """
+        Same as calling `check_and_use_quotas` for every timestamp and its
+        requests in order, returning the grants of every call. Each timestamp
+        sees the quota used by the ones before it.
+
+        On a single Redis instance all of them run in one Lua script, which
+        costs a single round trip and checks and spends the quotas atomically.
+
+        A Redis Cluster cannot run the script. There every timestamp costs two
+        round trips regardless of the number of requests, quotas and granules:
+        one pipeline reads every granule and a second one increments the
+        current granules.
+        """
+        if not self._use_script:
+            results = []
+            for timestamp, requests in requests_per_timestamp:
+                timestamp, grants = self.check_within_quotas(requests, timestamp)
+                self.use_quotas(requests, grants, timestamp)
+                results.append(grants)
+            return results
+
+        # See sliding_windows.lua for the layout of the keys and arguments.
+        # Lua tables are 1-indexed.
+        key_indices: MutableMapping[str, int] = {}
+        args: List[int] = [len(requests_per_timestamp)]
+        batches = []
+
+        for timestamp, requests in requests_per_timestamp:
+            prefixes = [request.prefix for request in requests]
+            requested = [request.requested for request in requests]
+            quotas_per_request = [request.quotas for request in requests]
+            assert all(quotas_per_request)
+
+            keys_per_request = self._build_granule_keys(
+                prefixes, quotas_per_request, int(timestamp)
+            )
+
+            global_quota_ids: MutableMapping[int, int] = {}
+            args.append(len(requests))
+
+            for i, quotas in enumerate(quotas_per_request):
+                args += [requested[i], len(quotas)]
+
+                for quota, keys in zip(quotas, keys_per_request[i]):
+                    global_quota_id = (
+                        global_quota_ids.setdefault(
+                            id(quota), len(global_quota_ids) + 1
+                        )
+                        if quota.prefix_override
+                        else 0
+                    )
+                    args += [
+                        quota.limit,
+                        quota.window_seconds,
+                        global_quota_id,
+                        len(keys),
+                        *[
+                            key_indices.setdefault(key, len(key_indices) + 1)
+                            for key in keys
+                        ],
+                    ]
+
+            batches.append((prefixes, quotas_per_request))
+
+        result = self.__script_check_and_use(keys=list(key_indices), args=args)
+
+        results = []
+        pos = 0
+        for prefixes, quotas_per_request in batches:
+            grants = []
+            for prefix, quotas in zip(prefixes, quotas_per_request):
+                granted = result[pos]
+                reached = result[pos + 1 : pos + 1 + len(quotas)]
+                pos += 1 + len(quotas)
+                grants.append(
+                    GrantedQuota(
+                        prefix=prefix,
+                        granted=granted,
+                        reached_quotas=[
+                            quota
+                            for quota, quota_reached in zip(quotas, reached)
+                            if quota_reached
+                        ],
+                    )
+                )
+            results.append(grants)
+
+        return results
@@ -6,7 +6,11 @@ import pytest
 from fastjsonschema.exceptions import JsonSchemaValueException
 
 from snuba.consumers.types import KafkaMessageMetadata
-from snuba.datasets.configuration.json_schema import STORAGE_VALIDATORS
+from snuba.datasets.configuration.json_schema import (
+    STORAGE_VALIDATORS,
+    _normalize,
+    get_validator,
+)
 from snuba.datasets.configuration.storage_builder import build_stream_loader
 from snuba.datasets.configuration.utils import DlqConfig, generate_dlq_config
 from snuba.datasets.message_filters import KafkaHeaderSelectFilter
@@ -201,3 +205,49 @@ def test_invalid_readiness_state() -> None:
         e.value.message
         == "data.readiness_state must be one of ['limited', 'deprecate', 'partial', 'complete']"
     )
+
+
+def test_get_validator_shared_for_equal_schemas() -> None:
+    schema = {"type": "object", "properties": {"key": {"type": "string"}}}
+    reordered = {"properties": {"key": {"type": "string"}}, "type": "object"}
+    assert get_validator(schema) is get_validator(reordered)
+
+    with pytest.raises(JsonSchemaValueException) as e:
+        get_validator(schema)({"key": 1})
+    assert e.value.message == "data.key must be string"
+
+
+def test_normalize_single_value_enum() -> None:
+    assert _normalize(
+        {
+            "type": "object",
+            "properties": {
+                "single": {"enum": ["a"]},
+                "multiple": {"enum": ["a", "b"]},
+                "enum": {"type": "string"},
+            },
+        }
+    ) == {
+        "type": "object",
+        "properties": {
+            "single": {"const": "a"},
+            "multiple": {"enum": ["a", "b"]},
+            "enum": {"type": "string"},
+        },
+    }
+
+
+def test_normalize_keeps_literals() -> None:
+    schema = {
+        "anyOf": [
+            {"const": {"enum": ["x"]}},
+            {"enum": [{"enum": ["x"]}, 1]},
+            {"type": "object", "default": {"enum": ["x"]}},
+        ]
+    }
+    assert _normalize(schema) == schema
+
+    validator = get_validator({"const": {"enum": ["x"]}})
+    validator({"enum": ["x"]})
+    with pytest.raises(JsonSchemaValueException):
+        validator({"const": "x"})
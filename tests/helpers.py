@@ -1,4 +1,5 @@
 from datetime import datetime
+from itertools import chain
 from typing import Any, Mapping, MutableSequence, Sequence, Union
 
 from snuba.clickhouse.http import JSONRowEncoder
@@ -6,23 +7,32 @@ from snuba.consumers.types import KafkaMessageMetadata
 from snuba.datasets.storage import WritableStorage
 from snuba.processor import InsertBatch, InsertEvent, ProcessedMessage
 from snuba.utils.metrics.backends.dummy import DummyMetricsBackend
-from snuba.writer import BatchWriterEncoderWrapper, WriterTableRow
+from snuba.writer import BatchWriterEncoderWrapper
 
 
 def write_processed_messages(
     storage: WritableStorage, messages: Sequence[ProcessedMessage]
 ) -> None:
-    rows: MutableSequence[WriterTableRow] = []
+    batches: MutableSequence[InsertBatch] = []
     for message in messages:
         assert isinstance(message, InsertBatch)
-        rows.extend(message.rows)
+        batches.append(message)
 
+    # All the rows go out in a single insert. The batch writer already
+    # streams them to ClickHouse in chunks, so rows are handed over lazily
+    # instead of being copied into one big list first.
+    #
+    # The writer sends on its own thread while rows are being encoded, so no
+    # extra writer thread is needed here. The messages are fully built before
+    # the insert starts on purpose: if building one failed halfway through
+    # the insert, the request would never be closed and its sending thread
+    # would block forever.
     BatchWriterEncoderWrapper(
         storage.get_table_writer().get_batch_writer(
             metrics=DummyMetricsBackend(strict=True)
         ),
         JSONRowEncoder(),
-    ).write(rows)
+    ).write(chain.from_iterable(batch.rows for batch in batches))
 
 
 def write_unprocessed_events(
@@ -8,9 +8,13 @@ from snuba.state.sliding_windows import (
 )
 
 
-@pytest.fixture
-def limiter() -> RedisSlidingWindowRateLimiter:
-    return RedisSlidingWindowRateLimiter()
+@pytest.fixture(scope="module", params=["script", "pipeline"])
+def limiter(request: pytest.FixtureRequest) -> RedisSlidingWindowRateLimiter:
+    limiter = RedisSlidingWindowRateLimiter()
+    # Cover the check_within_quotas/use_quotas path taken on a Redis Cluster
+    # as well.
+    limiter._use_script = request.param == "script"
+    return limiter
 
 
 TIMESTAMP_OFFSET = 100
@@ -47,12 +51,18 @@ def test_basic(limiter: RedisSlidingWindowRateLimiter) -> None:
         )
     ]
 
-    for timestamp in range(10):
-        resp = limiter.check_and_use_quotas(
-            [RequestedQuota(prefix="foo", requested=1, quotas=quotas)],
-            timestamp=TIMESTAMP_OFFSET + timestamp,
-        )
-        assert resp == [GrantedQuota(prefix="foo", granted=1, reached_quotas=[])]
+    resp_batch = limiter.check_and_use_quotas_batch(
+        [
+            (
+                TIMESTAMP_OFFSET + timestamp,
+                [RequestedQuota(prefix="foo", requested=1, quotas=quotas)],
+            )
+            for timestamp in range(10)
+        ]
+    )
+    assert (
+        resp_batch == [[GrantedQuota(prefix="foo", granted=1, reached_quotas=[])]] * 10
+    )
 
     resp = limiter.check_and_use_quotas(
         [RequestedQuota(prefix="foo", requested=1, quotas=quotas)],
@@ -60,20 +70,26 @@ def test_basic(limiter: RedisSlidingWindowRateLimiter) -> None:
     )
     assert resp == [GrantedQuota(prefix="foo", granted=0, reached_quotas=quotas)]
 
-    for timestamp in range(10, 20):
-        resp = limiter.check_and_use_quotas(
-            [RequestedQuota(prefix="foo", requested=1, quotas=quotas)],
-            timestamp=TIMESTAMP_OFFSET + timestamp,
-        )
-
-        assert resp == [GrantedQuota(prefix="foo", granted=1, reached_quotas=[])]
-
-        resp = limiter.check_and_use_quotas(
-            [RequestedQuota(prefix="foo", requested=1, quotas=quotas)],
-            timestamp=TIMESTAMP_OFFSET + timestamp,
-        )
-
-        assert resp == [GrantedQuota(prefix="foo", granted=0, reached_quotas=quotas)]
+    # Every timestamp is requested twice, the second request sees the quota
+    # used by the first one.
+    resp_batch = limiter.check_and_use_quotas_batch(
+        [
+            (
+                TIMESTAMP_OFFSET + timestamp,
+                [RequestedQuota(prefix="foo", requested=1, quotas=quotas)],
+            )
+            for timestamp in range(10, 20)
+            for _ in range(2)
+        ]
+    )
+    assert (
+        resp_batch
+        == [
+            [GrantedQuota(prefix="foo", granted=1, reached_quotas=[])],
+            [GrantedQuota(prefix="foo", granted=0, reached_quotas=quotas)],
+        ]
+        * 10
+    )
 
 
 @pytest.mark.redis_db
@@ -1,9 +1,23 @@
+import os
+import sys
 from datetime import datetime, timedelta
-from typing import Any, Callable, Generator, Optional, Tuple, Union, cast
+from typing import (
+    Any,
+    Callable,
+    Generator,
+    Mapping,
+    MutableMapping,
+    MutableSequence,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+    cast,
+)
 
 import pytest
 import pytz
-import simplejson as json
+import rapidjson
 from pytest import approx
 
 from snuba import state
@@ -13,6 +27,7 @@ from snuba.datasets.entities.factory import get_entity
 from snuba.datasets.metrics_messages import InputType
 from snuba.datasets.processors.metrics_aggregate_processor import timestamp_to_bucket
 from snuba.datasets.storage import WritableTableStorage
+from snuba.processor import InsertBatch, MessageProcessor, ProcessedMessage
 from tests.base import BaseApiTest
 from tests.helpers import write_processed_messages
 
@@ -28,6 +43,11 @@ TAG_4_KEY = "5"
 TAG_4_VALUE_1 = 34
 RETENTION_DAYS = 90
 
+# When set, the fixtures run only one message per project and value through
+# the processor and reuse its rows for every other second. Leave it unset to
+# exercise the processor for every generated message.
+FAST_FIXTURES = os.environ.get("FAST_FIXTURES", "0") != "0"
+
 
 def teardown_common() -> None:
     # Reset rate limits
@@ -45,9 +65,177 @@ def utc_yesterday_12_15() -> datetime:
     )
 
 
+def build_processed_messages(
+    processor: MessageProcessor,
+    base_time: datetime,
+    seconds: int,
+    project_ids: Sequence[int],
+    template: Mapping[str, Any],
+    values: Optional[Sequence[Any]] = None,
+) -> Sequence[ProcessedMessage]:
+    """
+    Processes one message per second and project, starting at `base_time`.
+    Each message is `template` with the project id and timestamp filled in.
+    If `values` is provided, the message for second `n` gets the value
+    `values[n % len(values)]` instead of the one in the template.
+    """
+    base_timestamp = base_time.timestamp()
+    metadata = KafkaMessageMetadata(0, 0, base_time)
+    if values is None:
+        values = [template["value"]]
+    num_values = len(values)
+
+    if FAST_FIXTURES:
+        return _build_processed_messages_from_skeletons(
+            processor,
+            base_timestamp,
+            seconds,
+            project_ids,
+            template,
+            values,
+            metadata,
+        )
+
+    # This stays in a single process on purpose: pickling the processed
+    # messages back from worker processes costs about as much as building
+    # them, and forking would also duplicate the open Redis and ClickHouse
+    # connections.
+    processed = [
+        processor.process_message(
+            {
+                **template,
+                "project_id": p,
+                "value": values[n % num_values],
+                "timestamp": base_timestamp + n,
+            },
+            metadata,
+        )
+        for n in range(seconds)
+        for p in project_ids
+    ]
+    return [message for message in processed if message]
+
+
+def _build_processed_messages_from_skeletons(
+    processor: MessageProcessor,
+    base_timestamp: float,
+    seconds: int,
+    project_ids: Sequence[int],
+    template: Mapping[str, Any],
+    values: Sequence[Any],
+    metadata: KafkaMessageMetadata,
+) -> Sequence[ProcessedMessage]:
+    """
+    Messages for the same project and value only differ in their timestamp,
+    so the processor runs once per (project, value) and the resulting rows
+    are copied with the timestamp of every other second. This assumes the
+    processor writes the message timestamp to the `timestamp` column and
+    derives no other column from it. The processor may still drop a message
+    based on its timestamp (e.g. when it is past retention), so dropped
+    messages are not reused: the processor runs again for the next second.
+    """
+    num_values = len(values)
+    skeletons: MutableMapping[Tuple[int, int], ProcessedMessage] = {}
+    events: MutableSequence[ProcessedMessage] = []
+    for n in range(seconds):
+        timestamp = base_timestamp + n
+        for p in project_ids:
+            key = (p, n % num_values)
+            skeleton = skeletons.get(key)
+            if skeleton is None:
+                message = {
+                    **template,
+                    "project_id": p,
+                    "value": values[key[1]],
+                    "timestamp": timestamp,
+                }
+                processed = processor.process_message(message, metadata)
+                if processed:
+                    skeletons[key] = processed
+                    events.append(processed)
+            else:
+                # Aggregate batches derive more than the `timestamp` column
+                # from the message timestamp, so their rows cannot be copied.
+                assert type(skeleton) is InsertBatch
+                row_timestamp = datetime.utcfromtimestamp(timestamp)
+                rows = [{**row, "timestamp": row_timestamp} for row in skeleton.rows]
+                events.append(type(skeleton)(rows, skeleton.origin_timestamp))
+    return events
+
+
+@pytest.mark.parametrize(
+    "entity_key, template, values",
+    [
+        pytest.param(
+            EntityKey.METRICS_COUNTERS,
+            {"type": InputType.COUNTER.value, "value": 1.0},
+            None,
+            id="counters",
+        ),
+        pytest.param(
+            EntityKey.METRICS_SETS,
+            {"type": InputType.SET.value},
+            [[v] for v in range(7)],
+            id="sets",
+        ),
+        pytest.param(
+            EntityKey.METRICS_DISTRIBUTIONS,
+            {"type": InputType.DISTRIBUTION.value, "value": list(range(100))},
+            None,
+            id="distributions",
+        ),
+    ],
+)
+def test_fast_fixtures_match_processor(
+    entity_key: EntityKey,
+    template: Mapping[str, Any],
+    values: Optional[Sequence[Any]],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    storage = cast(WritableTableStorage, get_entity(entity_key).get_writable_storage())
+    processor = storage.get_table_writer().get_stream_loader().get_processor()
+    template = {
+        **template,
+        "org_id": 101,
+        "tags": {TAG_1_KEY: TAG_1_VALUE_1, TAG_2_KEY: TAG_2_VALUE_1},
+        "metric_id": 1001,
+        "retention_days": RETENTION_DAYS,
+    }
+    base_time = utc_yesterday_12_15()
+
+    def build(fast: bool) -> Sequence[ProcessedMessage]:
+        monkeypatch.setattr(sys.modules[__name__], "FAST_FIXTURES", fast)
+        return build_processed_messages(
+            processor, base_time, 60, [1, 2], template, values
+        )
+
+    processed = build(False)
+    assert processed
+    assert build(True) == processed
+
+
 @pytest.mark.clickhouse_db
 @pytest.mark.redis_db
 class TestMetricsApiCounters(BaseApiTest):
+    storage: WritableTableStorage
+
+    QUERY_TEMPLATE = """MATCH (metrics_counters)
+                    SELECT sum(value) AS total_seconds BY project_id, org_id
+                    WHERE org_id = {org_id}
+                    AND project_id = 1
+                    AND metric_id = {metric_id}
+                    AND timestamp >= toDateTime('{start_time}')
+                    AND timestamp < toDateTime('{end_time}')
+                    GRANULARITY {granularity}
+                    """
+
+    @classmethod
+    def setup_class(cls) -> None:
+        cls.storage = cast(
+            WritableTableStorage,
+            get_entity(EntityKey.METRICS_COUNTERS).get_writable_storage(),
+        )
+
     @pytest.fixture
     def test_app(self) -> Any:
         return self.app
@@ -77,10 +265,8 @@ class TestMetricsApiCounters(BaseApiTest):
         self.skew = timedelta(seconds=self.seconds)
 
         self.base_time = utc_yesterday_12_15()
-        self.storage = cast(
-            WritableTableStorage,
-            get_entity(EntityKey.METRICS_COUNTERS).get_writable_storage(),
-        )
+        self.default_start_time = (self.base_time - self.skew).isoformat()
+        self.default_end_time = (self.base_time + self.skew).isoformat()
         self.generate_counters()
 
         yield
@@ -88,32 +274,22 @@ class TestMetricsApiCounters(BaseApiTest):
         teardown_common()
 
     def generate_counters(self) -> None:
-        events = []
-        for n in range(self.seconds):
-            for p in self.project_ids:
-                processed = (
-                    self.storage.get_table_writer()
-                    .get_stream_loader()
-                    .get_processor()
-                    .process_message(
-                        (
-                            {
-                                "org_id": self.org_id,
-                                "project_id": p,
-                                "unit": "ms",
-                                "type": InputType.COUNTER.value,
-                                "value": 1.0,
-                                "timestamp": self.base_time.timestamp() + n,
-                                "tags": self.default_tags,
-                                "metric_id": self.metric_id,
-                                "retention_days": RETENTION_DAYS,
-                            }
-                        ),
-                        KafkaMessageMetadata(0, 0, self.base_time),
-                    )
-                )
-                if processed:
-                    events.append(processed)
+        processor = self.storage.get_table_writer().get_stream_loader().get_processor()
+        events = build_processed_messages(
+            processor,
+            self.base_time,
+            self.seconds,
+            self.project_ids,
+            {
+                "org_id": self.org_id,
+                "unit": "ms",
+                "type": InputType.COUNTER.value,
+                "value": 1.0,
+                "tags": self.default_tags,
+                "metric_id": self.metric_id,
+                "retention_days": RETENTION_DAYS,
+            },
+        )
         write_processed_messages(self.storage, events)
 
     def build_simple_query(
@@ -129,29 +305,25 @@ class TestMetricsApiCounters(BaseApiTest):
         if not org_id:
             org_id = self.org_id
         if not start_time:
-            start_time = (self.base_time - self.skew).isoformat()
+            start_time = self.default_start_time
         if not end_time:
-            end_time = (self.base_time + self.skew).isoformat()
+            end_time = self.default_end_time
         if not granularity:
             granularity = 60
-        query_str = f"""MATCH (metrics_counters)
-                    SELECT sum(value) AS total_seconds BY project_id, org_id
-                    WHERE org_id = {org_id}
-                    AND project_id = 1
-                    AND metric_id = {metric_id}
-                    AND timestamp >= toDateTime('{start_time}')
-                    AND timestamp < toDateTime('{end_time}')
-                    GRANULARITY {granularity}
-                    """
-
-        return query_str
+        return self.QUERY_TEMPLATE.format(
+            metric_id=metric_id,
+            org_id=org_id,
+            start_time=start_time,
+            end_time=end_time,
+            granularity=granularity,
+        )
 
     def test_retrieval_basic(self) -> None:
         query_str = self.build_simple_query()
         response = self.app.post(
-            SNQL_ROUTE, data=json.dumps({"query": query_str, "dataset": "metrics"})
+            SNQL_ROUTE, data=rapidjson.dumps({"query": query_str, "dataset": "metrics"})
         )
-        data = json.loads(response.data)
+        data = rapidjson.loads(response.data)
 
         assert response.status_code == 200
         assert len(data["data"]) == 1, data
@@ -165,9 +337,9 @@ class TestMetricsApiCounters(BaseApiTest):
         ABSENT_METRIC_ID = 4096
         query_str = self.build_simple_query(metric_id=ABSENT_METRIC_ID)
         response = self.app.post(
-            SNQL_ROUTE, data=json.dumps({"query": query_str, "dataset": "metrics"})
+            SNQL_ROUTE, data=rapidjson.dumps({"query": query_str, "dataset": "metrics"})
         )
-        data = json.loads(response.data)
+        data = rapidjson.loads(response.data)
 
         assert response.status_code == 200
         assert len(data["data"]) == 0, data
@@ -185,9 +357,9 @@ class TestMetricsApiCounters(BaseApiTest):
             granularity=3600,
         )
         response = self.app.post(
-            SNQL_ROUTE, data=json.dumps({"query": query_str, "dataset": "metrics"})
+            SNQL_ROUTE, data=rapidjson.dumps({"query": query_str, "dataset": "metrics"})
         )
-        data = json.loads(response.data)
+        data = rapidjson.loads(response.data)
         assert response.status_code == 200
         assert len(data["data"]) == 1, data
 
@@ -201,6 +373,24 @@ class TestMetricsApiCounters(BaseApiTest):
 @pytest.mark.clickhouse_db
 @pytest.mark.redis_db
 class TestOrgMetricsApiCounters(BaseApiTest):
+    storage: WritableTableStorage
+
+    QUERY_TEMPLATE = """MATCH (org_metrics_counters)
+                    SELECT org_id, project_id BY org_id, project_id
+                    WHERE metric_id = {metric_id}
+                    AND timestamp >= toDateTime('{start_time}')
+                    AND timestamp < toDateTime('{end_time}')
+                    ORDER BY org_id ASC, project_id ASC
+                    GRANULARITY {granularity}
+                    """
+
+    @classmethod
+    def setup_class(cls) -> None:
+        cls.storage = cast(
+            WritableTableStorage,
+            get_entity(EntityKey.METRICS_COUNTERS).get_writable_storage(),
+        )
+
     @pytest.fixture
     def test_app(self) -> Any:
         return self.app
@@ -226,43 +416,34 @@ class TestOrgMetricsApiCounters(BaseApiTest):
         self.base_time = datetime.utcnow().replace(
             minute=0, second=0, microsecond=0, tzinfo=pytz.utc
         )
-        self.storage = cast(
-            WritableTableStorage,
-            get_entity(EntityKey.METRICS_COUNTERS).get_writable_storage(),
-        )
+        self.default_start_time = (self.base_time - self.skew).isoformat()
+        self.default_end_time = (self.base_time + self.skew).isoformat()
         self.generate_counters()
 
     def teardown_method(self, test_method: Any) -> None:
         teardown_common()
 
     def generate_counters(self) -> None:
-        events = []
-        for n in range(self.seconds):
-            for org_id, project_ids in self.org_projects.items():
-                for project_id in project_ids:
-                    processed = (
-                        self.storage.get_table_writer()
-                        .get_stream_loader()
-                        .get_processor()
-                        .process_message(
-                            (
-                                {
-                                    "org_id": org_id,
-                                    "project_id": project_id,
-                                    "unit": "ms",
-                                    "type": InputType.COUNTER.value,
-                                    "value": 1.0,
-                                    "tags": {},
-                                    "timestamp": self.base_time.timestamp() + n,
-                                    "metric_id": self.metric_id,
-                                    "retention_days": RETENTION_DAYS,
-                                }
-                            ),
-                            KafkaMessageMetadata(0, 0, self.base_time),
-                        )
-                    )
-                    if processed:
-                        events.append(processed)
+        events: MutableSequence[ProcessedMessage] = []
+        processor = self.storage.get_table_writer().get_stream_loader().get_processor()
+        for org_id, project_ids in self.org_projects.items():
+            events.extend(
+                build_processed_messages(
+                    processor,
+                    self.base_time,
+                    self.seconds,
+                    project_ids,
+                    {
+                        "org_id": org_id,
+                        "unit": "ms",
+                        "type": InputType.COUNTER.value,
+                        "value": 1.0,
+                        "tags": {},
+                        "metric_id": self.metric_id,
+                        "retention_days": RETENTION_DAYS,
+                    },
+                )
+            )
         write_processed_messages(self.storage, events)
 
     def build_simple_query(
@@ -275,28 +456,24 @@ class TestOrgMetricsApiCounters(BaseApiTest):
         if not metric_id:
             metric_id = self.metric_id
         if not start_time:
-            start_time = (self.base_time - self.skew).isoformat()
+            start_time = self.default_start_time
         if not end_time:
-            end_time = (self.base_time + self.skew).isoformat()
+            end_time = self.default_end_time
         if not granularity:
             granularity = 3600
-        query_str = f"""MATCH (org_metrics_counters)
-                    SELECT org_id, project_id BY org_id, project_id
-                    WHERE metric_id = {metric_id}
-                    AND timestamp >= toDateTime('{start_time}')
-                    AND timestamp < toDateTime('{end_time}')
-                    ORDER BY org_id ASC, project_id ASC
-                    GRANULARITY {granularity}
-                    """
-
-        return query_str
+        return self.QUERY_TEMPLATE.format(
+            metric_id=metric_id,
+            start_time=start_time,
+            end_time=end_time,
+            granularity=granularity,
+        )
 
     def test_retrieval_basic(self) -> None:
         query_str = self.build_simple_query()
         response = self.app.post(
-            SNQL_ROUTE, data=json.dumps({"query": query_str, "dataset": "metrics"})
+            SNQL_ROUTE, data=rapidjson.dumps({"query": query_str, "dataset": "metrics"})
         )
-        data = json.loads(response.data)
+        data = rapidjson.loads(response.data)
 
         assert response.status_code == 200
         assert data["data"] == [
@@ -309,9 +486,9 @@ class TestOrgMetricsApiCounters(BaseApiTest):
         ABSENT_METRIC_ID = 4096
         query_str = self.build_simple_query(metric_id=ABSENT_METRIC_ID)
         response = self.app.post(
-            SNQL_ROUTE, data=json.dumps({"query": query_str, "dataset": "metrics"})
+            SNQL_ROUTE, data=rapidjson.dumps({"query": query_str, "dataset": "metrics"})
         )
-        data = json.loads(response.data)
+        data = rapidjson.loads(response.data)
         assert response.status_code == 200
         assert data["data"] == [], data
 
@@ -324,9 +501,9 @@ class TestOrgMetricsApiCounters(BaseApiTest):
             granularity=3600,
         )
         response = self.app.post(
-            SNQL_ROUTE, data=json.dumps({"query": query_str, "dataset": "metrics"})
+            SNQL_ROUTE, data=rapidjson.dumps({"query": query_str, "dataset": "metrics"})
         )
-        data = json.loads(response.data)
+        data = rapidjson.loads(response.data)
         assert response.status_code == 200
         assert data["data"] == [
             {"org_id": 101, "project_id": 1},
@@ -338,6 +515,15 @@ class TestOrgMetricsApiCounters(BaseApiTest):
 @pytest.mark.clickhouse_db
 @pytest.mark.redis_db
 class TestMetricsApiSets(BaseApiTest):
+    storage: WritableTableStorage
+
+    @classmethod
+    def setup_class(cls) -> None:
+        cls.storage = cast(
+            WritableTableStorage,
+            get_entity(EntityKey.METRICS_SETS).get_writable_storage(),
+        )
+
     @pytest.fixture
     def test_app(self) -> Any:
         return self.app
@@ -368,10 +554,8 @@ class TestMetricsApiSets(BaseApiTest):
         self.skew = timedelta(seconds=self.seconds)
 
         self.base_time = utc_yesterday_12_15() - timedelta(minutes=self.seconds)
-        self.storage = cast(
-            WritableTableStorage,
-            get_entity(EntityKey.METRICS_SETS).get_writable_storage(),
-        )
+        self.default_start_time = (self.base_time - self.skew).isoformat()
+        self.default_end_time = (self.base_time + self.skew).isoformat()
         self.unique_set_values = 100
         self.generate_sets()
 
@@ -379,28 +563,21 @@ class TestMetricsApiSets(BaseApiTest):
         teardown_common()
 
     def generate_sets(self) -> None:
-        events = []
         processor = self.storage.get_table_writer().get_stream_loader().get_processor()
-
-        for n in range(self.seconds):
-            for p in self.project_ids:
-                msg = {
-                    "org_id": self.org_id,
-                    "project_id": p,
-                    "type": InputType.SET.value,
-                    "value": [n % self.unique_set_values],
-                    "timestamp": self.base_time.timestamp() + n,
-                    "tags": self.default_tags,
-                    "metric_id": self.metric_id,
-                    "retention_days": RETENTION_DAYS,
-                }
-
-                processed = processor.process_message(
-                    msg,
-                    KafkaMessageMetadata(0, 0, self.base_time),
-                )
-                if processed:
-                    events.append(processed)
+        events = build_processed_messages(
+            processor,
+            self.base_time,
+            self.seconds,
+            self.project_ids,
+            {
+                "org_id": self.org_id,
+                "type": InputType.SET.value,
+                "tags": self.default_tags,
+                "metric_id": self.metric_id,
+                "retention_days": RETENTION_DAYS,
+            },
+            values=[[v] for v in range(self.unique_set_values)],
+        )
         write_processed_messages(self.storage, events)
 
     def test_sets_basic(self) -> None:
@@ -415,13 +592,13 @@ class TestMetricsApiSets(BaseApiTest):
                     """.format(
             metric_id=self.metric_id,
             org_id=self.org_id,
-            start_time=(self.base_time - self.skew).isoformat(),
-            end_time=(self.base_time + self.skew).isoformat(),
+            start_time=self.default_start_time,
+            end_time=self.default_end_time,
         )
         response = self.app.post(
-            SNQL_ROUTE, data=json.dumps({"query": query_str, "dataset": "metrics"})
+            SNQL_ROUTE, data=rapidjson.dumps({"query": query_str, "dataset": "metrics"})
         )
-        data = json.loads(response.data)
+        data = rapidjson.loads(response.data)
 
         assert response.status_code == 200
         assert len(data["data"]) == 1, data
@@ -436,6 +613,15 @@ class TestMetricsApiSets(BaseApiTest):
 @pytest.mark.clickhouse_db
 @pytest.mark.redis_db
 class TestMetricsApiDistributions(BaseApiTest):
+    storage: WritableTableStorage
+
+    @classmethod
+    def setup_class(cls) -> None:
+        cls.storage = cast(
+            WritableTableStorage,
+            get_entity(EntityKey.METRICS_DISTRIBUTIONS).get_writable_storage(),
+        )
+
     @pytest.fixture
     def test_app(self) -> Any:
         return self.app
@@ -457,6 +643,8 @@ class TestMetricsApiDistributions(BaseApiTest):
         self.project_ids = [1, 2]  # 2 projects
         self.seconds = 180 * 60
         self.d_range_min, self.d_range_max = (0, 100)
+        # Every generated message shares this list, so it is only built once.
+        self.value_array = list(range(self.d_range_min, self.d_range_max))
 
         self.default_tags = {
             TAG_1_KEY: TAG_1_VALUE_1,
@@ -467,39 +655,29 @@ class TestMetricsApiDistributions(BaseApiTest):
         self.skew = timedelta(seconds=self.seconds)
 
         self.base_time = utc_yesterday_12_15() - timedelta(seconds=self.seconds)
-        self.storage = cast(
-            WritableTableStorage,
-            get_entity(EntityKey.METRICS_DISTRIBUTIONS).get_writable_storage(),
-        )
+        self.default_start_time = (self.base_time - self.skew).isoformat()
+        self.default_end_time = (self.base_time + self.skew).isoformat()
         self.generate_uniform_distributions()
 
     def teardown_method(self, test_method: Any) -> None:
         teardown_common()
 
     def generate_uniform_distributions(self) -> None:
-        events = []
         processor = self.storage.get_table_writer().get_stream_loader().get_processor()
-        value_array = list(range(self.d_range_min, self.d_range_max))
-
-        for n in range(self.seconds):
-            for p in self.project_ids:
-                msg = {
-                    "org_id": self.org_id,
-                    "project_id": p,
-                    "type": InputType.DISTRIBUTION.value,
-                    "value": value_array,
-                    "timestamp": self.base_time.timestamp() + n,
-                    "tags": self.default_tags,
-                    "metric_id": self.metric_id,
-                    "retention_days": RETENTION_DAYS,
-                }
-
-                processed = processor.process_message(
-                    msg,
-                    KafkaMessageMetadata(0, 0, self.base_time),
-                )
-                if processed:
-                    events.append(processed)
+        events = build_processed_messages(
+            processor,
+            self.base_time,
+            self.seconds,
+            self.project_ids,
+            {
+                "org_id": self.org_id,
+                "type": InputType.DISTRIBUTION.value,
+                "value": self.value_array,
+                "tags": self.default_tags,
+                "metric_id": self.metric_id,
+                "retention_days": RETENTION_DAYS,
+            },
+        )
         write_processed_messages(self.storage, events)
 
     def test_dists_percentiles(self) -> None:
@@ -514,13 +692,13 @@ class TestMetricsApiDistributions(BaseApiTest):
                     """.format(
             metric_id=self.metric_id,
             org_id=self.org_id,
-            start_time=(self.base_time - self.skew).isoformat(),
-            end_time=(self.base_time + self.skew).isoformat(),
+            start_time=self.default_start_time,
+            end_time=self.default_end_time,
         )
         response = self.app.post(
-            SNQL_ROUTE, data=json.dumps({"query": query_str, "dataset": "metrics"})
+            SNQL_ROUTE, data=rapidjson.dumps({"query": query_str, "dataset": "metrics"})
         )
-        data = json.loads(response.data)
+        data = rapidjson.loads(response.data)
 
         assert response.status_code == 200
         assert len(data["data"]) == 1, data
@@ -559,9 +737,9 @@ class TestMetricsApiDistributions(BaseApiTest):
             ).isoformat(),
         )
         response = self.app.post(
-            SNQL_ROUTE, data=json.dumps({"query": query_str, "dataset": "metrics"})
+            SNQL_ROUTE, data=rapidjson.dumps({"query": query_str, "dataset": "metrics"})
         )
-        data = json.loads(response.data)
+        data = rapidjson.loads(response.data)
 
         assert response.status_code == 200
         assert len(data["data"]) == 1, data
@@ -598,9 +776,9 @@ class TestMetricsApiDistributions(BaseApiTest):
             end_time=timestamp_to_bucket(self.base_time + self.skew, 3600).isoformat(),
         )
         response = self.app.post(
-            SNQL_ROUTE, data=json.dumps({"query": query_str, "dataset": "metrics"})
+            SNQL_ROUTE, data=rapidjson.dumps({"query": query_str, "dataset": "metrics"})
         )
-        data = json.loads(response.data)
+        data = rapidjson.loads(response.data)
 
         assert response.status_code == 200
         assert len(data["data"]) == 3, data